@@ -2,32 +2,37 @@
 Business Agent - Handles queries about business documents and KB.
 This agent demonstrates proper conversational memory with checkpointer.
 """
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.graph import StateGraph, START, END
+from utils.llm import get_llm
+from utils.messages import trim_history
 from .state import BusinessAgentState
 
 
+# System message to set context
+# Built once at import so every call sends a byte-identical prompt prefix.
+# Keep it STATIC: per-request data (memories, retrieved KB snippets, ids,
+# timestamps) must go in separate messages AFTER it, never interpolated
+# into it, otherwise provider-side prefix caching misses on every turn.
+_SYSTEM_MSG = SystemMessage(content="""You are a helpful business assistant with access to company knowledge base documents.
+    You can answer questions about business processes, policies, and supply chain operations.
+    Maintain context from previous messages in the conversation.""")
+
+
 def business_query_node(state: BusinessAgentState) -> BusinessAgentState:
     """
     Process business-related queries.
     The LLM has access to full conversation history via state["messages"].
     """
-    # Get the conversation history
-    messages = state["messages"]
+    # Get the conversation history, trimmed to the most recent turns
+    messages = trim_history(state["messages"])
 
-    # Initialize LLM
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    # System message to set context
-    system_prompt = """You are a helpful business assistant with access to company knowledge base documents.
-    You can answer questions about business processes, policies, and supply chain operations.
-    Maintain context from previous messages in the conversation."""
+    # Reuse the shared LLM client
+    llm = get_llm()
 
     # Create messages with system prompt
-    full_messages = [
-        {"role": "system", "content": system_prompt}
-    ] + messages
+    # Layout: [static system prompt, *history] - dynamic content comes last
+    full_messages = [_SYSTEM_MSG, *messages]
 
     # Get response from LLM
     response = llm.invoke(full_messages)
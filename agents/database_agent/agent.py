@@ -1,29 +1,30 @@
 """
 Database Agent - Handles structured data queries from databases.
 """
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from langgraph.graph import StateGraph, START, END
+from utils.llm import get_llm
+from utils.messages import trim_history
 from .state import DatabaseAgentState
 
 
+# Static system prompt - keep per-request data out of it (see business_agent)
+_SYSTEM_MSG = SystemMessage(content="""You are a database query assistant.
+    You help users query structured data from SQL databases.
+    You can generate SQL queries and explain the results.
+    Maintain context from previous messages in the conversation.""")
+
+
 def database_query_node(state: DatabaseAgentState) -> DatabaseAgentState:
     """
     Process database-related queries.
     Simulates SQL query generation and execution.
     """
-    messages = state["messages"]
+    messages = trim_history(state["messages"])
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
-
-    system_prompt = """You are a database query assistant.
-    You help users query structured data from SQL databases.
-    You can generate SQL queries and explain the results.
-    Maintain context from previous messages in the conversation."""
+    llm = get_llm()
 
-    full_messages = [
-        {"role": "system", "content": system_prompt}
-    ] + messages
+    full_messages = [_SYSTEM_MSG, *messages]
 
     response = llm.invoke(full_messages)
 
@@ -1,58 +1,114 @@
 """
 Supervisor Agent - Routes queries to appropriate specialized agents.
 """
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.messages import HumanMessage, SystemMessage
+import re
+from functools import lru_cache
 from langgraph.graph import StateGraph, START, END
+from pydantic import BaseModel
+from utils.llm import get_structured_llm
 from .state import SupervisorState
 from typing import Literal
 
 
-def supervisor_node(state: SupervisorState) -> SupervisorState:
+class RouteDecision(BaseModel):
+    """Structured routing decision returned by the supervisor LLM."""
+    next: Literal["business_agent", "database_agent", "finish"]
+
+
+def _get_router():
     """
-    Analyze the query and route to appropriate agent.
+    Return the routing LLM bound to the RouteDecision schema.
+    The model must answer with one of the allowed literals, so there is
+    no free-text parsing and no silent fallback route.
     """
-    messages = state["messages"]
+    return get_structured_llm(RouteDecision)
 
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
 
-    system_prompt = """You are a supervisor routing queries to specialized agents.
+_SYSTEM_MSG = SystemMessage(content="""You are a supervisor routing queries to specialized agents.
 
     Available agents:
     - business_agent: Handles questions about business processes, policies, KB documents, supply chain operations
     - database_agent: Handles queries about structured data, SQL queries, database information
-    - FINISH: Use this when the query has been fully answered
+    - finish: Use this when the query has been fully answered
+
+    Analyze the user's query and pick the agent that should handle it.
+    Consider the previous routing decision to maintain context for follow-up questions.""")
+
+
+# Keyword pre-classifier: obvious queries are routed without an LLM call
+_DB_RE = re.compile(r"\b(sql|select|join|table|schema|database|query|row|column)\b", re.I)
+_BIZ_RE = re.compile(r"\b(policy|policies|kb|knowledge base|supply chain|process|procedure)\b", re.I)
+
+
+def _prefilter_route(text: str):
+    """
+    Return a route if exactly one keyword set matches, otherwise None.
+    Ambiguous (both) or unknown (neither) queries fall back to the LLM.
+    """
+    is_db = _DB_RE.search(text) is not None
+    is_biz = _BIZ_RE.search(text) is not None
+
+    if is_db and not is_biz:
+        return "database_agent"
+    if is_biz and not is_db:
+        return "business_agent"
+    return None
 
-    Analyze the user's query and respond with ONLY the agent name: business_agent, database_agent, or FINISH.
-    Consider the conversation history to maintain context."""
 
+def _normalize(text: str) -> str:
+    """Normalize message text so equivalent queries share a cache entry."""
+    return " ".join(text.split()).lower()
+
+
+def _last_user_text(messages) -> str:
+    """Return the content of the most recent HumanMessage, or an empty string."""
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return msg.content if isinstance(msg.content, str) else str(msg.content)
+    return ""
+
+
+@lru_cache(maxsize=4096)
+def _route_cached(last_user_text: str, previous_route: str) -> str:
+    """
+    Ask the LLM for a routing decision.
+
+    The LLM runs at temperature=0, so the decision only depends on the
+    (normalized) user text and the previous route. Caching on those two
+    values skips the OpenAI round-trip for repeated queries.
+    """
     routing_messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Based on this conversation history, which agent should handle the query? Respond with ONLY: business_agent, database_agent, or FINISH.\n\nConversation: {messages}")
+        _SYSTEM_MSG,
+        HumanMessage(content=f"Previous routing decision: {previous_route or 'none'}\n\nUser query: {last_user_text}")
     ]
 
-    response = llm.invoke(routing_messages)
+    decision = _get_router().invoke(routing_messages)
+    return decision.next
 
-    # Extract routing decision
-    next_agent = response.content.strip().lower()
 
-    # Validate routing decision
-    if next_agent not in ["business_agent", "database_agent", "finish"]:
-        next_agent = "business_agent"  # Default to business agent
+def supervisor_node(state: SupervisorState) -> SupervisorState:
+    """
+    Analyze the query and route to appropriate agent.
+    Obvious queries are routed by keyword; the rest go to the LLM, whose
+    decisions are cached per (last user message, previous route).
+    """
+    messages = state["messages"]
+
+    last_user_text = _normalize(_last_user_text(messages))
+    next_agent = _prefilter_route(last_user_text) or _route_cached(last_user_text, state.get("next", ""))
 
-    return {
-        "next": next_agent,
-        "messages": [AIMessage(content=f"Routing to: {next_agent}")]
-    }
+    # The routing decision is an internal control signal, so it is NOT added
+    # to messages (that would grow every later prompt and checkpoint)
+    return {"next": next_agent}
 
 
 def route_to_agent(state: SupervisorState) -> Literal["business_agent", "database_agent", "__end__"]:
     """
     Conditional edge function to route to the appropriate agent.
     """
-    if state["next"] == "finish":
-        return "__end__"
-    return state["next"]
+    next_agent = state["next"]
+    return "__end__" if next_agent == "finish" else next_agent
 
 
 def create_supervisor_graph():
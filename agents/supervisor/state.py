@@ -11,6 +11,8 @@ class SupervisorState(TypedDict):
     """
     State for the supervisor agent.
     Includes routing decision and message history.
+    Kept as a TypedDict: nodes return partial updates that LangGraph merges
+    through the add_messages reducer.
     """
     messages: Annotated[list[BaseMessage], add_messages]
     next: str  # Which agent to route to next
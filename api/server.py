@@ -6,74 +6,181 @@ This demonstrates how to:
 2. Maintain conversational memory across HTTP requests
 3. Handle thread_id for conversation persistence
 """
-import uuid
-from typing import Optional, List, Dict
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+import secrets
+import asyncio
+import hashlib
+import orjson
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional, List, Dict, Literal
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, BaseMessage
 
 from agents.business_agent import create_business_agent_graph
 from agents.database_agent import create_database_agent_graph
 from agents.supervisor import create_supervisor_graph, SupervisorState
-from utils.checkpointer import get_memory_saver
+from utils.checkpointer import get_memory_saver, supports_async
+from utils.http import close_shared_clients
 from langgraph.graph import StateGraph, START, END
-from typing import Literal
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close the shared LLM HTTP connection pools on shutdown."""
+    yield
+    await close_shared_clients()
 
 
 # Initialize FastAPI app
-app = FastAPI(title="LangGraph Multi-Agent API")
+app = FastAPI(title="LangGraph Multi-Agent API", lifespan=lifespan)
 
 # Initialize checkpointer
 # IMPORTANT: Create checkpointer ONCE and reuse it across requests
 checkpointer = get_memory_saver()
 
-# Initialize individual agents with checkpointer (for manual routing)
-business_graph = create_business_agent_graph().compile(checkpointer=checkpointer)
-database_graph = create_database_agent_graph().compile(checkpointer=checkpointer)
+# Sync-only checkpointers (e.g. PyMySQLSaver) can't use ainvoke; for those,
+# graph calls run in a worker thread so the event loop stays free
+ASYNC_CHECKPOINTER = supports_async(checkpointer)
+
+# Graph factories and checkpointers that compiled graphs may be built from
+_FACTORIES = {
+    "supervisor": create_supervisor_graph,
+    "business": create_business_agent_graph,
+    "database": create_database_agent_graph,
+}
+_CHECKPOINTERS = {id(checkpointer): checkpointer}
+
+
+@lru_cache(maxsize=None)
+def _workflow(factory_name: str):
+    """Build each agent workflow ONCE and reuse it for both routing modes."""
+    return _FACTORIES[factory_name]()
+
+
+@lru_cache(maxsize=None)
+def _compile(factory_name: str, ckpt_id: Optional[int] = None):
+    """
+    Compile a workflow once per (graph, checkpointer) pair.
+    ckpt_id=None compiles with checkpointer=False (for embedded subgraphs):
+    checkpointer=None would make a subgraph inherit the parent's checkpointer.
+    """
+    ckpt = False if ckpt_id is None else _CHECKPOINTERS[ckpt_id]
+    return _workflow(factory_name).compile(checkpointer=ckpt)
+
+
+# Graphs are compiled lazily on first use through cached accessors, so
+# importing this module (e.g. from tests) doesn't pay for compiling them
+
+def get_business_graph():
+    """Business agent with checkpointer (for manual routing)."""
+    return _compile("business", id(checkpointer))
+
+
+def get_database_graph():
+    """Database agent with checkpointer (for manual routing)."""
+    return _compile("database", id(checkpointer))
+
+
+# Multi-agent system with supervisor (for automatic routing)
+_ROUTE: dict[str, str] = {
+    "finish": "__end__",
+    "business_agent": "business_agent",
+    "database_agent": "database_agent",
+}
+
 
-# Initialize multi-agent system with supervisor (for automatic routing)
 def route_supervisor(state: SupervisorState) -> Literal["business_agent", "database_agent", "__end__"]:
     """Route based on supervisor's decision."""
-    next_choice = state.get("next", "").lower()
-    if next_choice == "finish":
-        return "__end__"
-    elif next_choice == "business_agent":
-        return "business_agent"
-    elif next_choice == "database_agent":
-        return "database_agent"
-    else:
-        return "__end__"
-
-# Create multi-agent system with supervisor
-supervisor_workflow = create_supervisor_graph()
-business_workflow = create_business_agent_graph()
-database_workflow = create_database_agent_graph()
-
-# Compile sub-agents
-supervisor_compiled = supervisor_workflow.compile(checkpointer=checkpointer)
-business_compiled = business_workflow.compile(checkpointer=checkpointer)
-database_compiled = database_workflow.compile(checkpointer=checkpointer)
-
-# Create parent orchestration graph
-parent_workflow = StateGraph(SupervisorState)
-parent_workflow.add_node("supervisor", supervisor_compiled)
-parent_workflow.add_node("business_agent", business_compiled)
-parent_workflow.add_node("database_agent", database_compiled)
-parent_workflow.add_edge(START, "supervisor")
-parent_workflow.add_conditional_edges(
-    "supervisor",
-    route_supervisor,
-    {
-        "business_agent": "business_agent",
-        "database_agent": "database_agent",
-        "__end__": END
+    next_choice = state.get("next")
+    return _ROUTE.get(next_choice.lower(), "__end__") if next_choice else "__end__"
+
+
+@lru_cache(maxsize=None)
+def get_multi_agent_graph():
+    """Supervisor + both agents as one graph (for automatic routing)."""
+    # Compile sub-agents with checkpointer=False so only the parent graph
+    # persists state; with None they would inherit the parent's checkpointer
+    # and serialize every step a second time under their own namespace.
+    supervisor_compiled_inner = _compile("supervisor")
+    business_compiled_inner = _compile("business")
+    database_compiled_inner = _compile("database")
+
+    # Create parent orchestration graph
+    parent_workflow = StateGraph(SupervisorState)
+    parent_workflow.add_node("supervisor", supervisor_compiled_inner)
+    parent_workflow.add_node("business_agent", business_compiled_inner)
+    parent_workflow.add_node("database_agent", database_compiled_inner)
+    parent_workflow.add_edge(START, "supervisor")
+    parent_workflow.add_conditional_edges(
+        "supervisor",
+        route_supervisor,
+        {
+            "business_agent": "business_agent",
+            "database_agent": "database_agent",
+            "__end__": END
+        }
+    )
+    parent_workflow.add_edge("business_agent", END)
+    parent_workflow.add_edge("database_agent", END)
+
+    # Compile the multi-agent system
+    return parent_workflow.compile(checkpointer=checkpointer)
+
+
+_LAZY_GRAPHS = {
+    "business_graph": get_business_graph,
+    "database_graph": get_database_graph,
+    "multi_agent_graph": get_multi_agent_graph,
+}
+
+
+def __getattr__(name: str):
+    """Keep `from api.server import multi_agent_graph` etc. working (compiled on access)."""
+    if name in _LAZY_GRAPHS:
+        return _LAZY_GRAPHS[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Role lookup for formatting history (exact type match, no isinstance MRO walk)
+ROLE = {HumanMessage: "user", AIMessage: "assistant", SystemMessage: "system"}
+
+
+def _msg_default(obj):
+    """orjson fallback encoder for LangChain messages in streamed events."""
+    return {
+        "type": type(obj).__name__,
+        "content": getattr(obj, "content", None),
+        "id": getattr(obj, "id", None)
     }
-)
-parent_workflow.add_edge("business_agent", END)
-parent_workflow.add_edge("database_agent", END)
 
-# Compile the multi-agent system
-multi_agent_graph = parent_workflow.compile(checkpointer=checkpointer)
+
+async def _invoke(graph, payload, config):
+    """Invoke the graph natively async, or in a thread for sync-only checkpointers."""
+    if ASYNC_CHECKPOINTER:
+        return await graph.ainvoke(payload, config=config)
+    return await asyncio.to_thread(graph.invoke, payload, config=config)
+
+
+async def _batch(graph, payloads, configs):
+    """Batch-invoke the graph natively async, or in a thread for sync-only checkpointers."""
+    if ASYNC_CHECKPOINTER:
+        return await graph.abatch(payloads, config=configs)
+    return await asyncio.to_thread(graph.batch, payloads, config=configs)
+
+
+async def _get_state(graph, config):
+    """Read thread state natively async, or in a thread for sync-only checkpointers."""
+    if ASYNC_CHECKPOINTER:
+        return await graph.aget_state(config)
+    return await asyncio.to_thread(graph.get_state, config)
+
+
+async def _delete_thread(thread_id: str):
+    """Delete a thread's checkpoints natively async, or in a thread for sync-only checkpointers."""
+    if ASYNC_CHECKPOINTER:
+        return await checkpointer.adelete_thread(thread_id)
+    return await asyncio.to_thread(checkpointer.delete_thread, thread_id)
 
 
 # Pydantic models for API
@@ -82,6 +189,7 @@ class QueryRequest(BaseModel):
     message: str
     thread_id: Optional[str] = None
     agent_type: str = "business"  # "business" or "database"
+    preview: Optional[int] = Field(default=None, ge=1)  # truncate response to N chars
 
 
 class AutoQueryRequest(BaseModel):
@@ -90,6 +198,11 @@ class AutoQueryRequest(BaseModel):
     thread_id: Optional[str] = None
 
 
+class BatchQueryRequest(BaseModel):
+    """Request model for batched direct agent queries (manual routing)."""
+    items: List[QueryRequest]
+
+
 class QueryResponse(BaseModel):
     """Response model for agent queries."""
     response: str
@@ -103,6 +216,13 @@ class ConversationHistory(BaseModel):
     thread_id: str
 
 
+def _truncate(text: str, preview: Optional[int]) -> str:
+    """Cut text to preview chars (plus "...") so clients that only show a preview download less."""
+    if preview is None or len(text) <= preview:
+        return text
+    return text[:preview] + "..."
+
+
 @app.get("/")
 def root():
     """Health check endpoint."""
@@ -111,7 +231,8 @@ def root():
         "service": "LangGraph Multi-Agent API",
         "routing_modes": {
             "automatic": "POST /query/auto - Supervisor routes to appropriate agent",
-            "manual": "POST /query - Client specifies agent_type"
+            "manual": "POST /query - Client specifies agent_type",
+            "batch": "POST /query/batch - Many manual-routing queries in one request"
         },
         "available_agents": ["business", "database", "supervisor"]
     }
@@ -131,13 +252,13 @@ async def query_agent(request: QueryRequest):
     """
     try:
         # Generate thread_id if not provided
-        thread_id = request.thread_id or str(uuid.uuid4())
+        thread_id = request.thread_id or secrets.token_hex(16)
 
         # Select the appropriate agent
         if request.agent_type == "business":
-            graph = business_graph
+            graph = get_business_graph()
         elif request.agent_type == "database":
-            graph = database_graph
+            graph = get_database_graph()
         else:
             raise HTTPException(
                 status_code=400,
@@ -147,14 +268,15 @@ async def query_agent(request: QueryRequest):
         # IMPORTANT: Thread ID goes in config
         config = {"configurable": {"thread_id": thread_id}}
 
-        # Invoke the graph
-        result = graph.invoke(
+        # Invoke the graph without blocking the event loop
+        result = await _invoke(
+            graph,
             {"messages": [HumanMessage(content=request.message)]},
             config=config
         )
 
         # Extract the response
-        response_message = result["messages"][-1].content
+        response_message = _truncate(result["messages"][-1].content, request.preview)
 
         return QueryResponse(
             response=response_message,
@@ -182,19 +304,22 @@ async def query_agent_auto(request: AutoQueryRequest):
     """
     try:
         # Generate thread_id if not provided
-        thread_id = request.thread_id or str(uuid.uuid4())
+        thread_id = request.thread_id or secrets.token_hex(16)
 
         # Configure with thread_id
         config = {"configurable": {"thread_id": thread_id}}
 
         # Invoke the multi-agent system (supervisor will route)
-        result = multi_agent_graph.invoke(
+        result = await _invoke(
+            get_multi_agent_graph(),
             {"messages": [HumanMessage(content=request.message)]},
             config=config
         )
 
         # Extract the response (last message)
-        response_message = result["messages"][-1].content
+        # If the supervisor chose FINISH no agent ran, so there is no new reply
+        last_message = result["messages"][-1]
+        response_message = last_message.content if isinstance(last_message, AIMessage) else ""
 
         # Determine which agent was used (from state)
         routed_agent = result.get("next", "unknown")
@@ -209,17 +334,88 @@ async def query_agent_auto(request: AutoQueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/query/batch", response_model=List[QueryResponse])
+async def query_agent_batch(request: BatchQueryRequest):
+    """
+    Query specific agents with many messages in one HTTP request.
+
+    Items are grouped by agent_type and each group is sent through
+    graph.abatch(), so the LLM calls run concurrently instead of paying
+    one HTTP round-trip per message.
+
+    IMPORTANT:
+    - Each item gets its own thread_id (generated if not provided)
+    - Responses are returned in the same order as the request items
+    - Items run concurrently, so each thread_id may appear at most once
+      (turns on the same thread depend on each other's history)
+    """
+    graphs = {"business": get_business_graph(), "database": get_database_graph()}
+
+    for item in request.items:
+        if item.agent_type not in graphs:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Invalid agent_type: {item.agent_type}. Must be 'business' or 'database'"
+            )
+
+    given_ids = [item.thread_id for item in request.items if item.thread_id]
+    if len(set(given_ids)) != len(given_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="Batch items must use distinct thread_ids; send turns on the same thread sequentially"
+        )
+
+    try:
+        thread_ids = [item.thread_id or secrets.token_hex(16) for item in request.items]
+
+        # Group item indexes by agent so each graph gets a single abatch call
+        groups: Dict[str, List[int]] = {}
+        for i, item in enumerate(request.items):
+            groups.setdefault(item.agent_type, []).append(i)
+
+        async def run_group(agent_type: str, indexes: List[int]):
+            inputs = [
+                {"messages": [HumanMessage(content=request.items[i].message)]}
+                for i in indexes
+            ]
+            configs = [
+                {"configurable": {"thread_id": thread_ids[i]}}
+                for i in indexes
+            ]
+            results = await _batch(graphs[agent_type], inputs, configs)
+            return zip(indexes, results)
+
+        grouped_results = await asyncio.gather(
+            *(run_group(agent_type, indexes) for agent_type, indexes in groups.items())
+        )
+
+        # Restore the original request order
+        responses: List[Optional[QueryResponse]] = [None] * len(request.items)
+        for group in grouped_results:
+            for i, result in group:
+                responses[i] = QueryResponse(
+                    response=_truncate(result["messages"][-1].content, request.items[i].preview),
+                    thread_id=thread_ids[i],
+                    agent_type=request.items[i].agent_type
+                )
+
+        return responses
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/query/stream")
 async def query_agent_stream(request: QueryRequest):
     """
     Stream responses from agent (for real-time updates).
     """
-    thread_id = request.thread_id or str(uuid.uuid4())
+    thread_id = request.thread_id or secrets.token_hex(16)
 
     if request.agent_type == "business":
-        graph = business_graph
+        graph = get_business_graph()
     elif request.agent_type == "database":
-        graph = database_graph
+        graph = get_database_graph()
     else:
         raise HTTPException(status_code=400, detail="Invalid agent_type")
 
@@ -227,33 +423,49 @@ async def query_agent_stream(request: QueryRequest):
 
     # Stream the graph execution
     async def event_generator():
-        for event in graph.stream(
+        async for event in graph.astream(
             {"messages": [HumanMessage(content=request.message)]},
             config=config
         ):
-            yield f"data: {event}\n\n"
+            yield b"data: " + orjson.dumps(event, default=_msg_default) + b"\n\n"
 
     from fastapi.responses import StreamingResponse
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
 @app.get("/conversation/{thread_id}")
-async def get_conversation_history(thread_id: str, agent_type: str = "business"):
+async def get_conversation_history(
+    thread_id: str,
+    http_request: Request,
+    http_response: Response,
+    agent_type: str = "business",
+    limit: Optional[int] = Query(default=None, ge=0),
+    before: Optional[int] = Query(default=None, ge=0),
+    preview: Optional[int] = Query(default=None, ge=1)
+):
     """
     Retrieve conversation history for a specific thread.
+
+    Optional pagination for long conversations:
+    - before: only return messages with an index lower than this
+    - limit: return at most this many (most recent) messages
+    - preview: truncate each message's content to this many characters
+
+    Responses carry an ETag. Pollers that send it back in If-None-Match
+    get 304 Not Modified while the thread is unchanged.
     """
     try:
         # Select agent
         if agent_type == "business":
-            graph = business_graph
+            graph = get_business_graph()
         elif agent_type == "database":
-            graph = database_graph
+            graph = get_database_graph()
         else:
             raise HTTPException(status_code=400, detail="Invalid agent_type")
 
         # Get state for this thread
         config = {"configurable": {"thread_id": thread_id}}
-        state = graph.get_state(config)
+        state = await _get_state(graph, config)
 
         if not state or not state.values.get("messages"):
             return {
@@ -262,13 +474,26 @@ async def get_conversation_history(thread_id: str, agent_type: str = "business")
                 "note": "No conversation history found"
             }
 
+        # ETag from message count + last message id (plus the requested page)
+        all_messages = state.values["messages"]
+        etag_source = f"{agent_type}:{len(all_messages)}:{getattr(all_messages[-1], 'id', '')}:{limit}:{before}:{preview}"
+        etag = f'"{hashlib.sha1(etag_source.encode()).hexdigest()}"'
+
+        if http_request.headers.get("If-None-Match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        http_response.headers["ETag"] = etag
+
+        # Apply pagination before formatting so only the returned page is serialized
+        history = all_messages[:before]
+        if limit is not None:
+            history = history[-limit:] if limit > 0 else []
+
         # Format messages
-        messages = []
-        for msg in state.values["messages"]:
-            messages.append({
-                "role": "user" if isinstance(msg, HumanMessage) else "assistant",
-                "content": msg.content
-            })
+        messages = [
+            {"role": ROLE.get(type(msg), "assistant"), "content": _truncate(msg.content, preview)}
+            for msg in history
+        ]
 
         return ConversationHistory(
             messages=messages,
@@ -283,12 +508,22 @@ async def get_conversation_history(thread_id: str, agent_type: str = "business")
 async def delete_conversation(thread_id: str):
     """
     Delete conversation history for a specific thread.
+
+    Removes every checkpoint of the thread from the shared checkpointer,
+    so both routing modes start over on that thread_id. Checkpointers
+    without delete support answer 501.
     """
-    # Note: MemorySaver doesn't have a delete method
-    # For production with MySQL, you would delete from database
+    try:
+        await _delete_thread(thread_id)
+    except NotImplementedError:
+        raise HTTPException(
+            status_code=501,
+            detail=f"{type(checkpointer).__name__} does not support deleting conversations"
+        )
+
     return {
-        "message": f"Conversation {thread_id} deletion requested",
-        "note": "With MemorySaver, conversations are cleared on restart. Use MySQL for persistent storage."
+        "message": f"Conversation {thread_id} deleted",
+        "thread_id": thread_id
     }
 
 
@@ -2,28 +2,116 @@
 Example client for interacting with the FastAPI server.
 Demonstrates remote graph invocation with conversational memory.
 """
-import requests
-import json
+import asyncio
+import hashlib
+import os
+import shelve
+import sys
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import httpx
+import ijson
+import orjson
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 # API base URL
 BASE_URL = "http://localhost:8000"
 
+# Transient upstream failures (e.g. an overloaded LLM backend) are retried
+# with exponential backoff on the same pooled connection instead of aborting
+# the demo. Connection failures are retried by the transport itself.
+RETRY_ATTEMPTS = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+
+class _RetryTransport(httpx.HTTPTransport):
+    """HTTP transport that retries RETRY_STATUSES responses with backoff."""
+
+    def handle_request(self, request):
+        for attempt in range(RETRY_ATTEMPTS):
+            response = super().handle_request(request)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            response.close()
+            time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return super().handle_request(request)
+
+
+class _AsyncRetryTransport(httpx.AsyncHTTPTransport):
+    """Async counterpart of _RetryTransport."""
+
+    async def handle_async_request(self, request):
+        for attempt in range(RETRY_ATTEMPTS):
+            response = await super().handle_async_request(request)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+            await response.aclose()
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return await super().handle_async_request(request)
+
+
+# Connection pool settings. With the h2 package installed, httpx negotiates
+# HTTP/2 (via ALPN, so only for https:// servers) and multiplexes concurrent
+# requests over a single connection; otherwise it uses pooled HTTP/1.1.
+_TRANSPORT_KWARGS = dict(
+    http2=HTTP2_AVAILABLE,
+    retries=RETRY_ATTEMPTS,
+    limits=httpx.Limits(max_keepalive_connections=10, max_connections=20)
+)
+
+# Shared client settings
+_CLIENT_KWARGS = dict(
+    base_url=BASE_URL,
+    timeout=30.0,
+    headers={
+        "User-Agent": "langgraph-multi-agent-example",
+        "Accept": "application/json"
+    }
+)
 
-def query_agent(message: str, thread_id: str = None, agent_type: str = "business"):
-    """
-    Send a query to the agent API.
+# Request bodies are pre-encoded with orjson and sent as raw content
+_JSON_HEADERS = {"Content-Type": "application/json"}
 
-    Args:
-        message: The user's query
-        thread_id: Thread ID for conversation continuity (optional)
-        agent_type: "business" or "database"
+# Shared client: reuses keep-alive connections to BASE_URL across calls
+_client = httpx.Client(transport=_RetryTransport(**_TRANSPORT_KWARGS), **_CLIENT_KWARGS)
+
+
+# Section separator for demo output
+_SEP = "=" * 60
 
-    Returns:
-        Response dict with response, thread_id, and agent_type
-    """
-    url = f"{BASE_URL}/query"
 
+def _emit(lines):
+    """Write a demo step's output lines with a single stdout write."""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+# Demos only print previews, so the server truncates responses to these
+# lengths (the ?preview= / "preview" parameter) before sending them
+RESPONSE_PREVIEW = 100
+HISTORY_PREVIEW = 80
+
+
+# Optional on-disk response cache for repeated demo runs (DEMO_CACHE=1)
+DEMO_CACHE_ENABLED = os.environ.get("DEMO_CACHE") == "1"
+DEMO_CACHE_PATH = os.path.expanduser("~/.langgraph_demo_cache.db")
+
+
+def _cache_key(message: str, thread_id: str, agent_type: str, preview: int = None) -> str:
+    """Exact-match cache key for a query."""
+    return hashlib.sha256(f"{agent_type}|{thread_id or ''}|{preview or ''}|{message}".encode()).hexdigest()
+
+
+def _payload(message: str, thread_id: str, agent_type: str, preview: int) -> dict:
+    """Build the /query request body."""
     payload = {
         "message": message,
         "agent_type": agent_type
@@ -32,138 +120,231 @@ def query_agent(message: str, thread_id: str = None, agent_type: str = "business
     if thread_id:
         payload["thread_id"] = thread_id
 
-    response = requests.post(url, json=payload)
-    response.raise_for_status()
+    if preview:
+        payload["preview"] = preview
 
-    return response.json()
+    return payload
 
 
-def get_conversation_history(thread_id: str, agent_type: str = "business"):
+def query_agent(message: str, thread_id: str = None, agent_type: str = "business", preview: int = None):
     """
-    Retrieve conversation history for a thread.
-    """
-    url = f"{BASE_URL}/conversation/{thread_id}"
-    response = requests.get(url, params={"agent_type": agent_type})
-    response.raise_for_status()
-    return response.json()
-
+    Send a query to the agent API.
 
-def demo_conversation():
-    """
-    Demonstrate a full conversation with context preservation.
-    """
-    print("="*60)
-    print("DEMO: Multi-turn Conversation with Context")
-    print("="*60)
+    With DEMO_CACHE=1, responses are cached on disk by
+    (agent_type, thread_id, preview, message) so re-running the demos
+    skips the LLM round-trip for queries already seen.
 
-    # First query - no thread_id, will create new conversation
-    print("\n1. Starting new conversation...")
-    result1 = query_agent("What are the main supply chain challenges?")
+    Args:
+        message: The user's query
+        thread_id: Thread ID for conversation continuity (optional)
+        agent_type: "business" or "database"
+        preview: Ask the server to truncate the response to this many chars
 
-    print(f"   Response: {result1['response'][:100]}...")
-    print(f"   Thread ID: {result1['thread_id']}")
+    Returns:
+        Response dict with response, thread_id, and agent_type
+    """
+    payload = _payload(message, thread_id, agent_type, preview)
 
-    # Save thread_id for follow-up queries
-    thread_id = result1['thread_id']
+    if DEMO_CACHE_ENABLED:
+        key = _cache_key(message, thread_id, agent_type, preview)
+        with shelve.open(DEMO_CACHE_PATH) as cache:
+            if key in cache:
+                return cache[key]
 
-    # Follow-up query - use same thread_id
-    print("\n2. Follow-up question (with context)...")
-    result2 = query_agent(
-        "Can you explain the first one in detail?",
-        thread_id=thread_id
-    )
+    response = _client.post("/query", content=orjson.dumps(payload), headers=_JSON_HEADERS)
+    response.raise_for_status()
+    result = orjson.loads(response.content)
 
-    print(f"   Response: {result2['response'][:100]}...")
-    print(f"   Thread ID: {result2['thread_id']}")
+    if DEMO_CACHE_ENABLED:
+        with shelve.open(DEMO_CACHE_PATH) as cache:
+            cache[key] = result
 
-    # Another follow-up
-    print("\n3. Another follow-up (with context)...")
-    result3 = query_agent(
-        "What solutions would you recommend?",
-        thread_id=thread_id
-    )
+    return result
 
-    print(f"   Response: {result3['response'][:100]}...")
 
-    # Get full conversation history
-    print("\n4. Retrieving conversation history...")
-    history = get_conversation_history(thread_id)
+async def aquery_agent(client: httpx.AsyncClient, message: str, thread_id: str = None, agent_type: str = "business", preview: int = None):
+    """
+    Async version of query_agent for running independent queries concurrently.
 
-    print(f"   Total messages: {len(history['messages'])}")
-    print("\n   Full conversation:")
-    for i, msg in enumerate(history['messages'], 1):
-        role = msg['role'].upper()
-        content = msg['content'][:80] + "..." if len(msg['content']) > 80 else msg['content']
-        print(f"   {i}. [{role}] {content}")
+    Args:
+        client: Shared async client (one pool, many in-flight queries)
+        message: The user's query
+        thread_id: Thread ID for conversation continuity (optional)
+        agent_type: "business" or "database"
+        preview: Ask the server to truncate the response to this many chars
+    """
+    payload = _payload(message, thread_id, agent_type, preview)
 
-    print("\n✓ Context maintained across all queries!")
+    response = await client.post("/query", content=orjson.dumps(payload), headers=_JSON_HEADERS)
+    response.raise_for_status()
+    return orjson.loads(response.content)
 
-    return thread_id
 
+def iter_history(thread_id: str, agent_type: str = "business", preview: int = None):
+    """
+    Stream conversation history for a thread, one message dict at a time.
 
-def demo_multi_agent():
+    The response body is parsed incrementally with ijson, so memory stays
+    bounded for long conversations and messages can be handled as they
+    arrive instead of after the whole body is loaded. With preview set, the
+    server truncates each message's content before sending it.
     """
-    Demonstrate switching between different agents.
+    params = {"agent_type": agent_type}
+    if preview:
+        params["preview"] = preview
+
+    events = ijson.sendable_list()
+    parser = ijson.items_coro(events, "messages.item")
+    with _client.stream("GET", f"/conversation/{thread_id}", params=params) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            parser.send(chunk)
+            yield from events
+            del events[:]
+    parser.close()
+    yield from events
+
+
+@dataclass(slots=True)
+class Step:
     """
-    print("\n" + "="*60)
-    print("DEMO: Multi-Agent System")
-    print("="*60)
-
-    # Query business agent
-    print("\n1. Querying Business Agent...")
-    result1 = query_agent(
-        "What are the company policies for returns?",
-        agent_type="business"
-    )
-    print(f"   Response: {result1['response'][:100]}...")
-    business_thread = result1['thread_id']
-
-    # Query database agent (different thread)
-    print("\n2. Querying Database Agent...")
-    result2 = query_agent(
-        "Show me the total orders from last month",
-        agent_type="database"
-    )
-    print(f"   Response: {result2['response'][:100]}...")
-    database_thread = result2['thread_id']
-
-    # Continue business conversation
-    print("\n3. Continuing Business Agent conversation...")
-    result3 = query_agent(
-        "What about refunds?",
-        thread_id=business_thread,
-        agent_type="business"
-    )
-    print(f"   Response: {result3['response'][:100]}...")
-
-    print("\n✓ Each agent maintains separate conversation context!")
-
-
-def demo_new_vs_existing_thread():
+    One query in a demo.
+
+    Steps with the same thread key continue one conversation; thread=None
+    always starts a new one.
     """
-    Demonstrate difference between new and existing conversations.
+    message: str
+    thread: Optional[str] = None
+    agent_type: str = "business"
+    label: str = "Response"
+
+
+@dataclass(slots=True)
+class Stage:
+    """A numbered demo step. Its queries are independent and run concurrently."""
+    title: str
+    steps: Tuple[Step, ...]
+    notes: Tuple[str, ...] = ()
+    show_thread_id: bool = False
+
+
+@dataclass(slots=True)
+class Demo:
+    """A titled sequence of stages, optionally ending with a thread's history."""
+    title: str
+    stages: Tuple[Stage, ...]
+    history_thread: Optional[str] = None  # print this thread's history at the end
+    footer: str = ""
+
+
+DEMOS = {
+    # Full conversation with context preservation
+    "conversation": Demo(
+        title="Multi-turn Conversation with Context",
+        stages=(
+            Stage("Starting new conversation",
+                  (Step("What are the main supply chain challenges?", thread="main"),),
+                  show_thread_id=True),
+            Stage("Follow-up question (with context)",
+                  (Step("Can you explain the first one in detail?", thread="main"),),
+                  show_thread_id=True),
+            Stage("Another follow-up (with context)",
+                  (Step("What solutions would you recommend?", thread="main"),)),
+        ),
+        history_thread="main",
+        footer="✓ Context maintained across all queries!"
+    ),
+    # Switching between agents; the first two queries use separate threads
+    "multi_agent": Demo(
+        title="Multi-Agent System",
+        stages=(
+            Stage("Querying Business Agent and Database Agent concurrently", (
+                Step("What are the company policies for returns?", thread="business",
+                     label="Business response"),
+                Step("Show me the total orders from last month", thread="database",
+                     agent_type="database", label="Database response"),
+            )),
+            Stage("Continuing Business Agent conversation",
+                  (Step("What about refunds?", thread="business"),)),
+        ),
+        footer="✓ Each agent maintains separate conversation context!"
+    ),
+    # New vs existing conversations
+    "new_vs_existing": Demo(
+        title="New vs Existing Conversation",
+        stages=(
+            Stage("Starting conversation about inventory",
+                  (Step("What is inventory management?", thread="inventory"),)),
+            Stage("Follow-up with SAME thread_id",
+                  (Step("What are the best practices?", thread="inventory"),),
+                  notes=("   ✓ Agent has context from previous message",)),
+            Stage("Same question but with NEW thread_id",
+                  (Step("What are the best practices?"),),  # No thread = new conversation
+                  notes=("   ✗ Agent doesn't have context (new conversation)",)),
+        )
+    ),
+}
+
+
+async def _query_concurrently(steps, threads: dict):
+    """Run independent steps in parallel over one shared async client."""
+    transport = _AsyncRetryTransport(**_TRANSPORT_KWARGS)
+    async with httpx.AsyncClient(transport=transport, **_CLIENT_KWARGS) as client:
+        return await asyncio.gather(*(
+            aquery_agent(client, step.message, threads.get(step.thread), step.agent_type,
+                         preview=RESPONSE_PREVIEW)
+            for step in steps
+        ))
+
+
+def run_demo(name: str) -> dict:
     """
-    print("\n" + "="*60)
-    print("DEMO: New vs Existing Conversation")
-    print("="*60)
-
-    # Start conversation
-    print("\n1. Starting conversation about inventory...")
-    result1 = query_agent("What is inventory management?")
-    thread_id = result1['thread_id']
-    print(f"   Response: {result1['response'][:100]}...")
+    Run one of DEMOS by name.
 
-    # Continue with SAME thread_id
-    print("\n2. Follow-up with SAME thread_id...")
-    result2 = query_agent("What are the best practices?", thread_id=thread_id)
-    print(f"   Response: {result2['response'][:100]}...")
-    print("   ✓ Agent has context from previous message")
-
-    # New query with DIFFERENT thread_id (or None)
-    print("\n3. Same question but with NEW thread_id...")
-    result3 = query_agent("What are the best practices?")  # No thread_id = new conversation
-    print(f"   Response: {result3['response'][:100]}...")
-    print("   ✗ Agent doesn't have context (new conversation)")
+    Returns:
+        Mapping of the demo's thread keys to the server-assigned thread ids
+    """
+    demo = DEMOS[name]
+    threads = {}
+
+    _emit(["\n" + _SEP, f"DEMO: {demo.title}", _SEP])
+
+    for i, stage in enumerate(demo.stages, 1):
+        _emit([f"\n{i}. {stage.title}..."])
+
+        if len(stage.steps) == 1:
+            step = stage.steps[0]
+            results = [query_agent(step.message, threads.get(step.thread), step.agent_type,
+                                   preview=RESPONSE_PREVIEW)]
+        else:
+            results = asyncio.run(_query_concurrently(stage.steps, threads))
+
+        lines = []
+        for step, result in zip(stage.steps, results):
+            if step.thread:
+                threads[step.thread] = result['thread_id']
+            lines.append(f"   {step.label}: {result['response']}")
+            if stage.show_thread_id:
+                lines.append(f"   Thread ID: {result['thread_id']}")
+        lines.extend(stage.notes)
+        _emit(lines)
+
+    if demo.history_thread:
+        # Get full conversation history
+        lines = [f"\n{len(demo.stages) + 1}. Retrieving conversation history...", "\n   Full conversation:"]
+        total = 0
+        history = iter_history(threads[demo.history_thread], preview=HISTORY_PREVIEW)
+        for i, msg in enumerate(history, 1):
+            role = msg['role'].upper()
+            lines.append(f"   {i}. [{role}] {msg['content']}")
+            total = i
+        lines.append(f"\n   Total messages: {total}")
+        _emit(lines)
+
+    if demo.footer:
+        _emit(["\n" + demo.footer])
+
+    return threads
 
 
 if __name__ == "__main__":
@@ -172,19 +353,18 @@ if __name__ == "__main__":
 
     try:
         # Check if server is running
-        response = requests.get(BASE_URL)
-        print(f"✓ Server is running: {response.json()}\n")
+        response = _client.get("/")
+        print(f"✓ Server is running: {orjson.loads(response.content)}\n")
 
         # Run demos
-        demo_conversation()
-        demo_multi_agent()
-        demo_new_vs_existing_thread()
+        for name in DEMOS:
+            run_demo(name)
 
-        print("\n" + "="*60)
+        print("\n" + _SEP)
         print("All demos completed successfully!")
-        print("="*60)
+        print(_SEP)
 
-    except requests.exceptions.ConnectionError:
+    except httpx.ConnectError:
         print("❌ Error: Cannot connect to API server")
         print("\nPlease start the server first:")
         print("  cd langgraph_multi_agent")
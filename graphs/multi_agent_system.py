@@ -21,6 +21,7 @@ DOES pass a checkpointer. See main.py or api/server.py for examples.
 IMPORTANT: This file imports and reuses the agent implementations from agents/
 instead of duplicating their code, maintaining the modular structure.
 """
+import functools
 from typing import Literal
 from langgraph.graph import StateGraph, START, END
 
@@ -30,63 +31,84 @@ from agents.database_agent import create_database_agent_graph, DatabaseAgentStat
 from agents.supervisor import create_supervisor_graph, SupervisorState
 
 
+# Routing table: supervisor decision -> next node
+_ROUTE: dict[str, str] = {
+    "finish": "__end__",
+    "business_agent": "business_agent",
+    "database_agent": "database_agent",
+}
+
+
 def route_supervisor(state: SupervisorState) -> Literal["business_agent", "database_agent", "__end__"]:
     """
     Route based on supervisor's decision.
     """
-    next_choice = state.get("next", "").lower()
-
-    if next_choice == "finish":
-        return "__end__"
-    elif next_choice == "business_agent":
-        return "business_agent"
-    elif next_choice == "database_agent":
-        return "database_agent"
-    else:
-        return "__end__"
-
-
-# Create the individual agent workflows (uncompiled)
-supervisor_workflow = create_supervisor_graph()
-business_workflow = create_business_agent_graph()
-database_workflow = create_database_agent_graph()
-
-# Compile each agent as a subgraph
-supervisor_graph = supervisor_workflow.compile()
-business_graph = business_workflow.compile()
-database_graph = database_workflow.compile()
-
-# Create the parent graph that orchestrates the agents
-parent_workflow = StateGraph(SupervisorState)
-
-# Add the compiled agent graphs as nodes
-parent_workflow.add_node("supervisor", supervisor_graph)
-parent_workflow.add_node("business_agent", business_graph)
-parent_workflow.add_node("database_agent", database_graph)
-
-# Set entry point to supervisor
-parent_workflow.add_edge(START, "supervisor")
-
-# Add conditional routing from supervisor to agents
-parent_workflow.add_conditional_edges(
-    "supervisor",
-    route_supervisor,
-    {
-        "business_agent": "business_agent",
-        "database_agent": "database_agent",
-        "__end__": END
-    }
-)
-
-# After agents respond, they can either finish or continue
-# For simplicity, we'll end after each agent response
-parent_workflow.add_edge("business_agent", END)
-parent_workflow.add_edge("database_agent", END)
-
-# Compile the parent graph
-# ⚠️ NO CHECKPOINTER - LangGraph Studio provides its own persistence
-# If you add a checkpointer here, you'll get errors when using `langgraph dev`
-graph = parent_workflow.compile()  # ✅ Correct for Studio
+    next_choice = state.get("next")
+    return _ROUTE.get(next_choice.lower(), "__end__") if next_choice else "__end__"
+
+
+# Compiled agent subgraphs, keyed by agent name
+# Module-level so re-imports/reloads reuse them instead of recompiling
+_compiled_subgraphs = globals().get("_compiled_subgraphs", {})
+
+_AGENT_FACTORIES = {
+    "supervisor": create_supervisor_graph,
+    "business_agent": create_business_agent_graph,
+    "database_agent": create_database_agent_graph,
+}
+
+
+def _get_subgraph(name: str):
+    """
+    Compile each agent as a subgraph ONCE.
+    ⚠️ NO CHECKPOINTER - the parent graph (and Studio) handle persistence.
+    """
+    if name not in _compiled_subgraphs:
+        _compiled_subgraphs[name] = _AGENT_FACTORIES[name]().compile()
+    return _compiled_subgraphs[name]
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parent():
+    """
+    Build and compile the parent graph that orchestrates the agents.
+    Memoized, so repeated calls are a cache lookup instead of a recompile.
+    """
+    parent_workflow = StateGraph(SupervisorState)
+
+    # Add the compiled agent graphs as nodes
+    parent_workflow.add_node("supervisor", _get_subgraph("supervisor"))
+    parent_workflow.add_node("business_agent", _get_subgraph("business_agent"))
+    parent_workflow.add_node("database_agent", _get_subgraph("database_agent"))
+
+    # Set entry point to supervisor
+    parent_workflow.add_edge(START, "supervisor")
+
+    # Add conditional routing from supervisor to agents
+    parent_workflow.add_conditional_edges(
+        "supervisor",
+        route_supervisor,
+        {
+            "business_agent": "business_agent",
+            "database_agent": "database_agent",
+            "__end__": END
+        }
+    )
+
+    # After agents respond, they can either finish or continue
+    # For simplicity, we'll end after each agent response
+    parent_workflow.add_edge("business_agent", END)
+    parent_workflow.add_edge("database_agent", END)
+
+    # Compile the parent graph
+    # ⚠️ NO CHECKPOINTER - LangGraph Studio provides its own persistence
+    # If you add a checkpointer here, you'll get errors when using `langgraph dev`
+    return parent_workflow.compile()  # ✅ Correct for Studio
+
+
+# Keep the existing graph on hot reload (importlib.reload keeps module globals)
+if "graph" not in globals():
+    graph = _build_parent()
 
 # ❌ DON'T DO THIS (causes conflict with Studio):
 # from langgraph.checkpoint.memory import MemorySaver
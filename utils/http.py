@@ -0,0 +1,76 @@
+"""
+Shared HTTP connection pools for LLM clients.
+
+All agents use ChatOpenAI built on these clients (see utils/llm.py) so they
+share ONE connection pool instead of each opening their own TCP/TLS
+connections to OpenAI.
+
+IMPORTANT NOTES:
+1. Get the clients with get_shared_clients() - they are created on first use
+   and reused everywhere
+2. HTTP/2 is used when the optional `h2` package is installed
+3. Close the clients on application shutdown (see close_shared_clients);
+   the next get_shared_clients() call creates a fresh pair
+"""
+import threading
+from typing import Optional, Tuple
+import httpx
+
+# HTTP/2 support is optional - only enable it if h2 is installed
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool limits shared by the sync and async clients
+SHARED_LIMITS = httpx.Limits(
+    max_connections=200,
+    max_keepalive_connections=100,
+    keepalive_expiry=60,
+)
+
+# (sync client for llm.invoke(), async client for ainvoke/astream/abatch)
+_clients: Optional[Tuple[httpx.Client, httpx.AsyncClient]] = None
+# Sync nodes run in executor threads, so first calls can race to create the pair
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_shared_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Return the shared (sync, async) HTTP clients, creating them if needed.
+
+    Cache anything built on them keyed on the returned pair (as
+    utils/llm.py does), so it is rebuilt after close_shared_clients()
+    instead of keeping a closed client.
+    """
+    global _clients
+    with _CLIENTS_LOCK:
+        if _clients is None:
+            _clients = (
+                httpx.Client(http2=HTTP2_AVAILABLE, limits=SHARED_LIMITS),
+                httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=SHARED_LIMITS),
+            )
+        return _clients
+
+
+async def close_shared_clients():
+    """
+    Close the shared HTTP clients.
+
+    Call this from the application's shutdown hook, e.g. a FastAPI lifespan:
+
+        @asynccontextmanager
+        async def lifespan(app):
+            yield
+            await close_shared_clients()
+
+    A later get_shared_clients() call (e.g. the app starting again in
+    another TestClient block) creates new clients.
+    """
+    global _clients
+    with _CLIENTS_LOCK:
+        clients, _clients = _clients, None
+    if clients is not None:
+        clients[0].close()
+        await clients[1].aclose()
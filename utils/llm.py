@@ -0,0 +1,50 @@
+"""
+Shared LLM client for all agents.
+
+Every agent uses the same model settings, so one ChatOpenAI instance is
+built on the shared HTTP clients (see utils/http.py) and reused.
+"""
+import threading
+from functools import lru_cache
+from langchain_openai import ChatOpenAI
+from utils.http import get_shared_clients
+
+# lru_cache doesn't stop concurrent first calls from each building a client
+_LLM_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _build_llm(clients) -> ChatOpenAI:
+    """Build the LLM client on one (sync, async) pair of shared HTTP clients."""
+    http_client, http_async_client = clients
+    return ChatOpenAI(
+        model="gpt-4o-mini",
+        temperature=0,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+@lru_cache(maxsize=8)
+def _build_structured_llm(schema, clients):
+    """Bind the LLM for one pair of shared HTTP clients to a structured output schema."""
+    return _build_llm(clients).with_structured_output(schema)
+
+
+def get_llm() -> ChatOpenAI:
+    """
+    Return the shared LLM client.
+    Built once per pair of shared HTTP clients, so the underlying connection
+    pool is reused across requests instead of being rebuilt inside every
+    node call, and a new client is built after close_shared_clients().
+    """
+    clients = get_shared_clients()
+    with _LLM_LOCK:
+        return _build_llm(clients)
+
+
+def get_structured_llm(schema):
+    """Return the shared LLM bound to `schema` via with_structured_output()."""
+    clients = get_shared_clients()
+    with _LLM_LOCK:
+        return _build_structured_llm(schema, clients)
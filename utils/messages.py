@@ -0,0 +1,43 @@
+"""
+Helpers for preparing conversation history before it is sent to the LLM.
+
+The checkpointer keeps the FULL history for a thread. These helpers only
+limit what is sent to the model on each turn, so prompt size (and cost)
+stays bounded as conversations grow.
+"""
+import os
+from typing import Optional
+from langchain_core.messages import BaseMessage, SystemMessage
+
+# Maximum number of non-system messages sent to the LLM per turn
+# (the checkpointer still stores the full history)
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "50"))
+
+
+def trim_history(messages: list[BaseMessage], max_messages: Optional[int] = None) -> list[BaseMessage]:
+    """
+    Keep the first SystemMessage (if any) plus the last `max_messages` messages.
+
+    max_messages defaults to MAX_HISTORY_MESSAGES (env var, 50 by default),
+    read on every call so tests can tune the window at runtime. Per-turn
+    prompt size then stays flat instead of growing with the whole
+    conversation. max_messages=0 keeps only the system message.
+
+    The system message is kept as the first element so the prompt prefix
+    stays identical across turns, which lets OpenAI's automatic prompt
+    cache hit.
+    """
+    if max_messages is None:
+        max_messages = MAX_HISTORY_MESSAGES
+    if max_messages < 0:
+        raise ValueError(f"max_messages must be >= 0, got {max_messages}")
+
+    if len(messages) <= max_messages:
+        return messages
+
+    system = next((m for m in messages if isinstance(m, SystemMessage)), None)
+    rest = [m for m in messages if m is not system]
+    # rest[-0:] would be the whole list, so 0 is handled explicitly
+    recent = rest[-max_messages:] if max_messages else []
+
+    return [system, *recent] if system is not None else recent